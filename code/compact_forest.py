@@ -0,0 +1,261 @@
+"""Variante compacta del Random Forest para servir predicciones.
+
+Uso:
+    python compact_forest.py --model-dir models/<corrida> --max-mae-delta 0.25
+
+Convierte el bosque de sklearn a arrays planos (umbrales y hojas en float32,
+índices de nodo uint16/int32) y, opcionalmente, elige de forma greedy el menor
+subconjunto de árboles cuyas predicciones en el holdout se alejan en promedio
+a lo sumo --max-mae-delta (MAE) de las del bosque completo. Guarda rf_compact.npz,
+rf_pruned.npz y compact_report.json junto a los artefactos del modelo; main.py
+elige la variante con MODEL_VARIANT.
+"""
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+# 1) Bosque compacto
+VARIANTS = ('full', 'compact', 'pruned')
+
+def float32_threshold(threshold):
+    """Redondea los umbrales float64 hacia -inf en float32.
+
+    sklearn compara X (float32) <= umbral (float64); con el mayor float32 que no
+    supera el umbral, la comparación en float32 da exactamente el mismo lado.
+    """
+    t32 = threshold.astype(np.float32)
+    up = t32 > threshold
+    t32[up] = np.nextafter(t32[up], np.float32(-np.inf))
+    return t32
+
+class CompactForest:
+    """Bosque de regresión en arrays planos con la misma interfaz predict que sklearn.
+
+    Los hijos se guardan como índices locales a cada árbol; las hojas apuntan a
+    sí mismas, así que recorrer `depth` niveles deja cada fila en su hoja sin
+    ramas por árbol.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth):
+        self.feature   = feature
+        self.threshold = threshold
+        self.left      = left
+        self.right     = right
+        self.value     = value
+        self.roots     = roots
+        self.depth     = int(depth)
+
+    @classmethod
+    def from_sklearn(cls, forest, trees=None):
+        estimators = forest.estimators_ if trees is None else [forest.estimators_[t] for t in trees]
+        max_nodes = max(e.tree_.node_count for e in estimators)
+        index_dtype = np.uint16 if max_nodes <= np.iinfo(np.uint16).max else np.int32
+        feature_dtype = np.uint8 if forest.n_features_in_ <= np.iinfo(np.uint8).max else np.uint16
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for e in estimators:
+            t = e.tree_
+            local = np.arange(t.node_count)
+            is_leaf = t.children_left == -1
+            features.append(np.where(is_leaf, 0, t.feature))
+            thresholds.append(np.where(is_leaf, 0, t.threshold))
+            lefts.append(np.where(is_leaf, local, t.children_left))
+            rights.append(np.where(is_leaf, local, t.children_right))
+            values.append(t.value[:, 0, 0])
+            roots.append(offset)
+            offset += t.node_count
+
+        return cls(
+            feature   = np.concatenate(features).astype(feature_dtype),
+            threshold = float32_threshold(np.concatenate(thresholds)),
+            left      = np.concatenate(lefts).astype(index_dtype),
+            right     = np.concatenate(rights).astype(index_dtype),
+            value     = np.concatenate(values).astype(np.float32),
+            roots     = np.array(roots, dtype=np.int32),
+            depth     = max(e.tree_.max_depth for e in estimators),
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+    def predict_per_tree(self, X):
+        """Predicción de cada árbol, forma (n_filas, n_árboles)"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).astype(np.int64)
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = self.roots + np.where(go_left, self.left[node], self.right[node]).astype(np.int64)
+        return self.value[node]
+
+    def predict(self, X):
+        return self.predict_per_tree(X).mean(axis=1, dtype=np.float64)
+
+    def save(self, path: str):
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, value=self.value, roots=self.roots, depth=self.depth)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(**{k: data[k] for k in data.files})
+
+# 2) Selección greedy de árboles
+def greedy_tree_order(per_tree, reference):
+    """Orden forward que en cada paso minimiza la desviación media absoluta
+    entre el promedio de los árboles elegidos y `reference` (la predicción del
+    bosque completo).
+
+    Devuelve (orden, curva) donde curva[k-1] es esa desviación con los primeros
+    k árboles del orden.
+    """
+    n_rows, n_trees = per_tree.shape
+    remaining = list(range(n_trees))
+    order, curve = [], []
+    running = np.zeros(n_rows)
+    for k in range(1, n_trees + 1):
+        candidates = (running[:, None] + per_tree[:, remaining]) / k
+        deviation = np.abs(candidates - reference[:, None]).mean(axis=0)
+        best = int(np.argmin(deviation))
+        tree = remaining.pop(best)
+        order.append(tree)
+        curve.append(float(deviation[best]))
+        running += per_tree[:, tree]
+    return order, curve
+
+def time_predict(predict, X, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict(X)
+    return (time.perf_counter() - start) / repeats * 1000
+
+def tradeoff_curve(model_rf, order, curve, per_tree, X_hold, y_hold, chosen_k, repeats):
+    """Tamaño, latencia y error medidos sobre bosques con los primeros k árboles del orden greedy"""
+    n_trees = len(order)
+    ks = sorted({int(k) for k in np.linspace(1, n_trees, CURVE_POINTS).round()} | {chosen_k})
+    points = []
+    for k in ks:
+        forest = CompactForest.from_sklearn(model_rf, trees=sorted(order[:k]))
+        points.append({
+            'n_trees': k,
+            'mae_vs_full': round(curve[k - 1], 4),
+            'mae': round(float(np.abs(per_tree[:, order[:k]].mean(axis=1) - y_hold).mean()), 4),
+            'nbytes': forest.nbytes,
+            'latency_ms_1_row': round(time_predict(forest.predict, X_hold[:1], repeats), 4),
+            'latency_ms_holdout': round(time_predict(forest.predict, X_hold, max(repeats // 20, 1)), 3),
+        })
+    return points
+
+# 3) Herramienta de construcción
+CURVE_POINTS = 20
+
+def latest_run(models_dir: str):
+    """Corrida más reciente de train.py (los nombres empiezan con la fecha UTC)"""
+    if not os.path.isdir(models_dir):
+        return None
+    runs = sorted(d for d in os.listdir(models_dir) if os.path.exists(os.path.join(models_dir, d, 'rf_model.pkl')))
+    return os.path.join(models_dir, runs[-1]) if runs else None
+
+def build_variants(args):
+    from train import file_hash, load_features, split_indices
+
+    if args.model_dir is None:
+        raise ValueError("No hay corridas en models/: ejecuta train.py o indica --model-dir")
+
+    # Los datos del holdout deben ser los mismos con los que se entrenó la corrida;
+    # sin manifest.json (p. ej. el modelo del notebook) no hay holdout conocido
+    manifest_path = os.path.join(args.model_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"{args.model_dir} no tiene manifest.json: usa una corrida de train.py")
+    with open(manifest_path) as f:
+        expected = json.load(f)['data_sha256']
+    if expected != file_hash(args.data):
+        raise ValueError(f"--data no coincide con el CSV de entrenamiento de {args.model_dir}")
+
+    # Se usan los escaladores de la propia corrida, no los del cache de características
+    model_rf = joblib.load(os.path.join(args.model_dir, 'rf_model.pkl'))
+    model_rf.set_params(n_jobs=None)
+    scaler_X = joblib.load(os.path.join(args.model_dir, 'scaler_X.pkl'))
+    scaler_y = joblib.load(os.path.join(args.model_dir, 'scaler_y.pkl'))
+    X, y, _, _, _, _, _ = load_features(args.data, args.cache_dir)
+    _, test_idx = split_indices(len(y))
+    X_hold = scaler_X.transform(np.asarray(X[test_idx]))
+    y_hold = np.asarray(y[test_idx])
+
+    def mae(pred_scaled):
+        pred = scaler_y.inverse_transform(np.asarray(pred_scaled).reshape(-1, 1)).ravel()
+        return float(np.abs(pred - y_hold).mean())
+
+    compact = CompactForest.from_sklearn(model_rf)
+    max_diff = float(np.abs(compact.predict(X_hold) - model_rf.predict(X_hold)).max())
+    if max_diff > 1e-5:
+        raise ValueError(f"La variante compacta no reproduce al bosque completo (diferencia máxima {max_diff:.2e})")
+    scale, mean = float(scaler_y.scale_[0]), float(scaler_y.mean_[0])
+    per_tree = compact.predict_per_tree(X_hold).astype(np.float64) * scale + mean
+    full_pred = per_tree.mean(axis=1)
+    order, curve = greedy_tree_order(per_tree, full_pred)
+
+    # El menor k cuya predicción se aleja del bosque completo a lo sumo max_mae_delta
+    k = next((i + 1 for i, d in enumerate(curve) if d <= args.max_mae_delta), len(order))
+    pruned = CompactForest.from_sklearn(model_rf, trees=sorted(order[:k]))
+
+    compact_path = os.path.join(args.model_dir, 'rf_compact.npz')
+    pruned_path = os.path.join(args.model_dir, 'rf_pruned.npz')
+    compact.save(compact_path)
+    pruned.save(pruned_path)
+
+    row = X_hold[:1]
+    variants = {
+        'full': (model_rf.predict, os.path.getsize(os.path.join(args.model_dir, 'rf_model.pkl')),
+                 len(model_rf.estimators_)),
+        'compact': (compact.predict, os.path.getsize(compact_path), compact.n_trees),
+        'pruned': (pruned.predict, os.path.getsize(pruned_path), pruned.n_trees),
+    }
+    report = {
+        'holdout_rows': int(len(y_hold)),
+        'max_mae_delta': args.max_mae_delta,
+        'variants': {
+            name: {
+                'n_trees': n_trees,
+                'file_bytes': size,
+                'mae': round(mae(predict(X_hold)), 4),
+                'latency_ms_1_row': round(time_predict(predict, row, args.repeats), 4),
+                'latency_ms_holdout': round(time_predict(predict, X_hold, max(args.repeats // 20, 1)), 3),
+            }
+            for name, (predict, size, n_trees) in variants.items()
+        },
+        'tradeoff_curve': tradeoff_curve(model_rf, order, curve, per_tree, X_hold, y_hold, k, args.repeats),
+        'tree_order': order,
+    }
+    with open(os.path.join(args.model_dir, 'compact_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'variante':<8} {'árboles':>7} {'bytes':>10} {'MAE':>8} {'ms/fila':>8}")
+    for name, v in report['variants'].items():
+        print(f"{name:<8} {v['n_trees']:>7} {v['file_bytes']:>10} {v['mae']:>8.4f} {v['latency_ms_1_row']:>8.3f}")
+    return report
+
+def parse_args(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Construye variantes compactas del Random Forest")
+    parser.add_argument('--model-dir', default=latest_run(os.path.join(here, 'models')),
+                        help="Corrida de train.py con rf_model.pkl (por defecto la más reciente en models/)")
+    parser.add_argument('--data', default=os.path.join(here, '..', 'data', 'criptos_5000_narrativas.csv'))
+    parser.add_argument('--cache-dir', default=os.path.join(here, '.feature_cache'))
+    parser.add_argument('--max-mae-delta', type=float, default=0.25,
+                        help="MAE máximo (puntos %%) de la variante podada respecto al bosque completo")
+    parser.add_argument('--repeats', type=int, default=200)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    build_variants(parse_args())
@@ -1,15 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import joblib
 import numpy as np
 from pycoingecko import CoinGeckoAPI
+from compact_forest import CompactForest, VARIANTS
+from similarity import NumpyEncoder, SimilarityIndex
+from profiling import RequestProfiler
+import re
+import requests
 import time
+import os
 from datetime import datetime, timedelta
 
-# 1) Carga tus artefactos
-model_rf      = joblib.load('rf_model.pkl')
-scaler_feats  = joblib.load('scaler_X.pkl')
-scaler_target = joblib.load('scaler_y.pkl')
+# 1) Carga tus artefactos (MODEL_DIR apunta a una corrida de train.py, p. ej. models/<corrida>)
+MODEL_DIR     = os.environ.get('MODEL_DIR', '.')
+# MODEL_VARIANT: 'full' (pickle de sklearn) o 'compact' / 'pruned' (generadas por compact_forest.py)
+MODEL_VARIANT = os.environ.get('MODEL_VARIANT', 'full')
+if MODEL_VARIANT not in VARIANTS:
+    raise ValueError(f"MODEL_VARIANT inválido: '{MODEL_VARIANT}' (opciones: {', '.join(VARIANTS)})")
+if MODEL_VARIANT == 'full':
+    model_rf  = joblib.load(os.path.join(MODEL_DIR, 'rf_model.pkl'))
+else:
+    model_rf  = CompactForest.load(os.path.join(MODEL_DIR, f'rf_{MODEL_VARIANT}.npz'))
+scaler_feats  = joblib.load(os.path.join(MODEL_DIR, 'scaler_X.pkl'))
+scaler_target = joblib.load(os.path.join(MODEL_DIR, 'scaler_y.pkl'))
+
+# Encoder + KMeans exportados por train.py; sin ellos /api/similar queda deshabilitado
+similarity_index = None
+if os.path.exists(os.path.join(MODEL_DIR, 'encoder.npz')):
+    kmeans_path = os.path.join(MODEL_DIR, 'kmeans.npz')
+    centers = np.load(kmeans_path)['centers'] if os.path.exists(kmeans_path) else None
+    similarity_index = SimilarityIndex(NumpyEncoder.load(os.path.join(MODEL_DIR, 'encoder.npz')), centers)
 
 feature_cols = [
     'current_price',
@@ -29,6 +50,25 @@ recommendations_cache = {}
 cache_timestamp = None
 CACHE_DURATION = 300  # 5 minutos
 
+# El modelo se entrenó con características en USD: todo se consulta y puntúa en USD
+# y solo los montos de salida se convierten con el cache de tipos de cambio
+BASE_CURRENCY = 'usd'
+# next_refresh: cuándo volver a consultar; failed: la última actualización tuvo alguna fuente caída
+fx_cache = {'next_refresh': 0, 'rates': {BASE_CURRENCY: 1.0}, 'failed': False}
+FX_CACHE_DURATION = 3600  # 1 hora
+FX_RETRY_DELAY = 60  # tras un fallo se sigue sirviendo lo último válido y se reintenta en 1 minuto
+# CoinGecko no publica todas las monedas fiat (p. ej. PEN); se completan con esta fuente (base USD)
+FX_FALLBACK_URL = os.environ.get('FX_FALLBACK_URL', 'https://open.er-api.com/v6/latest/USD')
+CURRENCY_SYMBOLS = {'usd': '$', 'eur': '€', 'pen': 'S/ '}
+MONEY_FIELDS = ['current_price', 'market_cap', 'total_volume', 'ath', 'atl']
+
+# Cache de series de precio por crypto_id: {crypto_id: (timestamp, tiempos_ms, precios)}
+price_history_cache = {}
+PRICE_HISTORY_CACHE_SIZE = 500
+MAX_CHART_POINTS = 2000
+MAX_SIMILAR = 50
+CHART_FORMATS = ('json', 'binary')
+
 # 3) Funciones auxiliares
 def lookup_crypto_id(symbol: str) -> str:
     res = cg_api.search(query=symbol)
@@ -41,7 +81,7 @@ def lookup_crypto_id(symbol: str) -> str:
 
 def get_crypto_features(crypto_id: str) -> dict:
     data = cg_api.get_coins_markets(
-        vs_currency='usd',
+        vs_currency=BASE_CURRENCY,
         ids=[crypto_id],
         price_change_percentage='24h'
     )
@@ -63,8 +103,143 @@ def get_crypto_features(crypto_id: str) -> dict:
     }
 
 def get_price_history(crypto_id: str):
-    chart = cg_api.get_coin_market_chart_by_id(id=crypto_id, vs_currency='usd', days=7)
-    return chart['prices']
+    """Serie de 7 días como arrays (tiempos en ms, precios), cacheada CACHE_DURATION segundos"""
+    current_time = time.time()
+    cached = price_history_cache.get(crypto_id)
+    if cached and current_time - cached[0] < CACHE_DURATION:
+        return cached[1], cached[2]
+
+    chart  = cg_api.get_coin_market_chart_by_id(id=crypto_id, vs_currency=BASE_CURRENCY, days=7)
+    series = np.array(chart['prices'], dtype=np.float64).reshape(-1, 2)
+    series = series[np.isfinite(series).all(axis=1)]  # NaN/inf no son JSON válido
+    times, prices = series[:, 0], series[:, 1]
+
+    # Se descartan las entradas vencidas y, si aún se supera el límite, las más antiguas
+    for key in [k for k, v in price_history_cache.items() if current_time - v[0] >= CACHE_DURATION]:
+        del price_history_cache[key]
+    while len(price_history_cache) >= PRICE_HISTORY_CACHE_SIZE:
+        del price_history_cache[min(price_history_cache, key=lambda k: price_history_cache[k][0])]
+    price_history_cache[crypto_id] = (current_time, times, prices)
+    return times, prices
+
+def lttb_downsample(times, prices, threshold):
+    """Largest-Triangle-Three-Buckets: reduce la serie a `threshold` puntos conservando su forma"""
+    n = len(times)
+    if threshold >= n or threshold < 3:
+        return times, prices
+
+    every   = (n - 2) / (threshold - 2)
+    indices = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end   = int((i + 1) * every) + 1
+        # Promedio del bucket siguiente como tercer vértice del triángulo
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_t = times[end:next_end].mean()
+        avg_p = prices[end:next_end].mean()
+        areas = np.abs(
+            (times[a] - avg_t) * (prices[start:end] - prices[a]) -
+            (times[a] - times[start:end]) * (avg_p - prices[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices.append(a)
+    indices.append(n - 1)
+    return times[indices], prices[indices]
+
+def encode_chart_binary(times, prices):
+    """Formato binario little-endian: uint32 n, uint32 reservado, n float64 tiempos (ms), n float32 precios"""
+    header = np.array([len(times), 0], dtype='<u4').tobytes()
+    return header + times.astype('<f8').tobytes() + prices.astype('<f4').tobytes()
+
+# Tipos de cambio
+class UnsupportedCurrencyError(ValueError):
+    """Código de moneda desconocido (error del cliente)"""
+
+class FxUnavailableError(RuntimeError):
+    """No hay tipo de cambio disponible por una caída de las fuentes"""
+
+def refresh_fx_rates():
+    """Actualiza fx_cache con unidades de cada moneda por 1 USD.
+
+    Se parte de los últimos tipos válidos, así una fuente caída no borra sus
+    monedas; con cualquier fallo se reintenta en FX_RETRY_DELAY segundos.
+    """
+    rates = dict(fx_cache['rates'])
+    failed = False
+    try:
+        # CoinGecko publica los tipos con base BTC
+        cg_rates = cg_api.get_exchange_rates()['rates']
+        usd = cg_rates[BASE_CURRENCY]['value']
+        for code, r in cg_rates.items():
+            if r.get('type') == 'fiat':
+                rates[code] = r['value'] / usd
+    except Exception:
+        failed = True
+    if FX_FALLBACK_URL:
+        try:
+            fallback = requests.get(FX_FALLBACK_URL, timeout=10).json()['rates']
+            cg_codes = set() if failed else {c for c, r in cg_rates.items() if r.get('type') == 'fiat'}
+            for code, value in fallback.items():
+                if code.lower() not in cg_codes:
+                    rates[code.lower()] = float(value)
+        except Exception:
+            failed = True
+    fx_cache['rates'] = rates
+    fx_cache['failed'] = failed
+    fx_cache['next_refresh'] = time.time() + (FX_RETRY_DELAY if failed else FX_CACHE_DURATION)
+
+def parse_currency(value) -> str:
+    """Normaliza y valida un código de moneda contra la tabla de tipos de cambio"""
+    if value is None or value == '':
+        currency = BASE_CURRENCY
+    elif isinstance(value, str):
+        currency = value.strip().lower()
+    else:
+        currency = None
+    if not currency or not re.fullmatch(r'[a-z]{3,5}', currency):
+        # No se repite el valor recibido: termina en el HTML de error
+        raise UnsupportedCurrencyError("Código de moneda inválido")
+    get_fx_rate(currency)
+    return currency
+
+def get_fx_rate(currency: str) -> float:
+    """Unidades de `currency` por 1 USD, desde el cache (se refresca cada FX_CACHE_DURATION)"""
+    currency = currency.lower()
+    if currency == BASE_CURRENCY:
+        return 1.0
+    if time.time() >= fx_cache['next_refresh']:
+        refresh_fx_rates()
+    if currency in fx_cache['rates']:
+        return fx_cache['rates'][currency]
+    if fx_cache['failed']:
+        raise FxUnavailableError(f"Tipo de cambio no disponible para '{currency}', intenta más tarde")
+    raise UnsupportedCurrencyError(f"Moneda no soportada: '{currency}'")
+
+def convert_records(records, currency: str):
+    """Copias de los registros con los montos convertidos desde USD (no modifica el cache).
+
+    En USD los montos quedan exactamente como los entrega CoinGecko; el redondeo
+    se hace al mostrarlos (format_price), no en la respuesta de la API.
+    """
+    rate = get_fx_rate(currency)
+    converted = []
+    for r in records:
+        c = dict(r)
+        if currency.lower() != BASE_CURRENCY:
+            for field in MONEY_FIELDS:
+                if c.get(field) is not None:
+                    c[field] = c[field] * rate
+        c['currency'] = currency.lower()
+        converted.append(c)
+    return converted
+
+def format_price(value) -> str:
+    """Precio para el HTML: 8 cifras significativas, sin el ruido de la conversión"""
+    return f"{value:.8g}" if isinstance(value, (int, float)) else str(value)
+
+def currency_symbol(currency: str) -> str:
+    return CURRENCY_SYMBOLS.get(currency.lower(), currency.upper() + ' ')
 
 def rf_predict_and_categorize(values_list):
     arr         = np.array(values_list).reshape(1, -1)
@@ -81,7 +256,7 @@ def rf_predict_and_categorize(values_list):
 def get_top_cryptos(limit=50):
     """Obtiene las top cryptos por market cap"""
     return cg_api.get_coins_markets(
-        vs_currency='usd',
+        vs_currency=BASE_CURRENCY,
         order='market_cap_desc',
         per_page=limit,
         page=1,
@@ -89,18 +264,22 @@ def get_top_cryptos(limit=50):
         price_change_percentage='24h'
     )
 
+def crypto_feature_values(crypto_data):
+    """Vector de características en el orden de feature_cols"""
+    return [
+        crypto_data['current_price'],
+        crypto_data['total_volume'],
+        crypto_data['ath'],
+        crypto_data['atl'],
+        crypto_data.get('price_change_percentage_24h', 0.0),
+        crypto_data.get('ath_change_percentage', 0.0),
+        crypto_data.get('atl_change_percentage', 0.0)
+    ]
+
 def analyze_crypto_for_recommendations(crypto_data):
     """Analiza una crypto y devuelve su predicción y score"""
     try:
-        values = [
-            crypto_data['current_price'],
-            crypto_data['total_volume'],
-            crypto_data['ath'],
-            crypto_data['atl'],
-            crypto_data.get('price_change_percentage_24h', 0.0),
-            crypto_data.get('ath_change_percentage', 0.0),
-            crypto_data.get('atl_change_percentage', 0.0)
-        ]
+        values = crypto_feature_values(crypto_data)
         
         prediction, category = rf_predict_and_categorize(values)
         
@@ -192,8 +371,8 @@ def get_recommendation_reason(prediction, category, crypto_data):
     
     return ", ".join(reasons)
 
-def generate_recommendations(risk_tolerance="MEDIO", limit=10):
-    """Genera recomendaciones personalizadas"""
+def get_market_snapshot():
+    """Analiza el universo de cryptos (top 50) y actualiza el índice de similitud; cacheado CACHE_DURATION"""
     global recommendations_cache, cache_timestamp
     
     # Verificar cache
@@ -201,20 +380,78 @@ def generate_recommendations(risk_tolerance="MEDIO", limit=10):
     if (cache_timestamp and 
         current_time - cache_timestamp < CACHE_DURATION and 
         recommendations_cache):
-        cryptos_analyzed = recommendations_cache
+        return recommendations_cache
+    
+    # Obtener y analizar cryptos
+    top_cryptos = get_top_cryptos(50)
+    cryptos_analyzed = []
+    features = []
+    
+    for crypto in top_cryptos:
+        analysis = analyze_crypto_for_recommendations(crypto)
+        if analysis:
+            cryptos_analyzed.append(analysis)
+            features.append(crypto_feature_values(crypto))
+    
+    # Solo se re-embeben las monedas cuyas características cambiaron
+    if similarity_index is not None and cryptos_analyzed:
+        similarity_index.update([c['id'] for c in cryptos_analyzed], scaler_feats.transform(np.array(features)),
+                                records=cryptos_analyzed)
+    
+    # Actualizar cache
+    recommendations_cache = cryptos_analyzed
+    cache_timestamp = current_time
+    return cryptos_analyzed
+
+def get_similar_cryptos(symbol: str, k=5):
+    """Top-k monedas del universo más cercanas en el espacio de embeddings del autoencoder"""
+    if similarity_index is None:
+        raise RuntimeError("Índice de similitud no disponible: falta encoder.npz en MODEL_DIR")
+    
+    get_market_snapshot()
+    # Una sola lectura del estado: embedding, vecinos y registros salen de la misma versión
+    state = similarity_index.state
+    key = symbol.lower()
+    target = next((c for c in state.records.values() if key in (c['id'], c['symbol'].lower(), c['name'].lower())), None)
+    
+    if target:
+        crypto_id  = target['id']
+        embedding  = state.embeddings[state.position[crypto_id]]
+        prediction, category = target['prediction'], target['category']
     else:
-        # Obtener y analizar cryptos
-        top_cryptos = get_top_cryptos(50)
-        cryptos_analyzed = []
-        
-        for crypto in top_cryptos:
-            analysis = analyze_crypto_for_recommendations(crypto)
-            if analysis:
-                cryptos_analyzed.append(analysis)
-        
-        # Actualizar cache
-        recommendations_cache = cryptos_analyzed
-        cache_timestamp = current_time
+        # Fuera del universo: se embebe al vuelo sin modificar el índice
+        crypto_id  = lookup_crypto_id(symbol)
+        feats      = get_crypto_features(crypto_id)
+        vals       = [feats[c] for c in feature_cols]
+        embedding  = similarity_index.encoder.encode(scaler_feats.transform(np.array(vals).reshape(1, -1)))[0]
+        prediction, category = rf_predict_and_categorize(vals)
+    
+    similar = []
+    for neighbor_id, distance, cluster in similarity_index.query(embedding, k, exclude=crypto_id, state=state):
+        c = state.records[neighbor_id]
+        similar.append({
+            'id': c['id'],
+            'symbol': c['symbol'],
+            'name': c['name'],
+            'image': c['image'],
+            'current_price': c['current_price'],
+            'prediction': c['prediction'],
+            'category': c['category'],
+            'cluster': cluster,
+            'distance': round(distance, 4)
+        })
+    
+    return {
+        'crypto_id': crypto_id,
+        'prediction': prediction,
+        'category': category,
+        'cluster': similarity_index.cluster_of(embedding),
+        'similar': similar
+    }
+
+def generate_recommendations(risk_tolerance="MEDIO", limit=10):
+    """Genera recomendaciones personalizadas"""
+    cryptos_analyzed = get_market_snapshot()
     
     # Filtrar categorías no recomendadas primero
     valid_recommendations = [c for c in cryptos_analyzed if c['category'] != 'NO_RECOMENDADO']
@@ -248,9 +485,9 @@ def generate_recommendations(risk_tolerance="MEDIO", limit=10):
     
     return filtered[:limit]
 
-def get_portfolio_suggestions(budget=1000, risk_tolerance="MEDIO"):
-    """Genera sugerencias de portafolio diversificado"""
-    recommendations = generate_recommendations(risk_tolerance, 20)
+def get_portfolio_suggestions(budget=1000, risk_tolerance="MEDIO", currency=BASE_CURRENCY):
+    """Genera sugerencias de portafolio diversificado (budget y montos en `currency`)"""
+    recommendations = convert_records(generate_recommendations(risk_tolerance, 20), currency)
     
     if not recommendations:
         return []
@@ -308,6 +545,11 @@ def get_portfolio_suggestions(budget=1000, risk_tolerance="MEDIO"):
 app = Flask(__name__)
 CORS(app)
 
+# Perfilado opcional (PROFILING=1 o /admin/profiling); apagado no agrega costo
+profiler = RequestProfiler.from_env()
+profiler.init_app(app)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
 @app.route('/', methods=['GET','POST'])
 def home():
     html_form = """
@@ -501,6 +743,11 @@ def home():
         <form id="predict-form" method="post" action="/?tab=predict">
           <div class="input-row">
             <input id="symbol" name="symbol" placeholder="bitcoin" required>
+            <select name="currency">
+              <option value="usd" selected>USD</option>
+              <option value="eur">EUR</option>
+              <option value="pen">PEN</option>
+            </select>
             <button type="submit">
               <span id="btn-text">Predecir</span>
               <div class="loader" id="loader"></div>
@@ -521,6 +768,11 @@ def home():
               <option value="ALTO">Riesgo Alto</option>
             </select>
             <input type="number" name="limit" placeholder="10" value="10" min="1" max="20">
+            <select name="currency">
+              <option value="usd" selected>USD</option>
+              <option value="eur">EUR</option>
+              <option value="pen">PEN</option>
+            </select>
             <button type="submit">Generar Recomendaciones</button>
           </div>
         </form>
@@ -532,6 +784,11 @@ def home():
         <form method="post" action="/?tab=portfolio">
           <div class="input-row">
             <input type="number" name="budget" placeholder="1000" value="1000" min="100" step="100">
+            <select name="currency">
+              <option value="usd" selected>USD</option>
+              <option value="eur">EUR</option>
+              <option value="pen">PEN</option>
+            </select>
             <select name="risk_tolerance">
               <option value="BAJO">Riesgo Bajo</option>
               <option value="MEDIO" selected>Riesgo Medio</option>
@@ -563,21 +820,30 @@ def home():
           showTab(tab);
         }
 
-        // Chart handling
+        // Chart handling: la serie se pide reducida al ancho del canvas en formato binario
         const dataEl = document.getElementById('chart-data');
         if (dataEl) {
-          const history = JSON.parse(dataEl.textContent);
-          new Chart(document.getElementById('price-chart'), {
-            type: 'line',
-            data: {
-              labels: history.map(p => new Date(p[0]).toLocaleDateString()),
-              datasets: [{ data: history.map(p => p[1]), borderColor: '#00ffff', fill: false }]
-            },
-            options: {
-              elements: { point: { radius: 0 } },
-              plugins: { legend: { display: false } }
-            }
-          });
+          const canvas = document.getElementById('price-chart');
+          const points = Math.min(Math.max(canvas.clientWidth || 300, 50), 1000);
+          fetch(`/api/chart-data?id=${encodeURIComponent(dataEl.dataset.id)}&currency=${dataEl.dataset.currency}&points=${points}&format=binary`)
+            .then(r => { if (!r.ok) throw new Error(r.status); return r.arrayBuffer(); })
+            .then(buf => {
+              const n = new DataView(buf).getUint32(0, true);
+              const times = new Float64Array(buf, 8, n);
+              const prices = new Float32Array(buf, 8 + 8 * n, n);
+              new Chart(canvas, {
+                type: 'line',
+                data: {
+                  labels: Array.from(times, t => new Date(t).toLocaleDateString()),
+                  datasets: [{ data: Array.from(prices), borderColor: '#00ffff', fill: false }]
+                },
+                options: {
+                  elements: { point: { radius: 0 } },
+                  plugins: { legend: { display: false } }
+                }
+              });
+            })
+            .catch(err => console.error('chart-data', err));
         }
       };
 
@@ -600,45 +866,51 @@ def home():
         if tab == 'predict':
             sym = request.form['symbol'].strip()
             try:
-                cid       = lookup_crypto_id(sym)
-                feats     = get_crypto_features(cid)
+                currency = parse_currency(request.form.get('currency'))
+                with profiler.stage('lookup_crypto_id'):
+                    cid   = lookup_crypto_id(sym)
+                with profiler.stage('get_crypto_features'):
+                    feats = get_crypto_features(cid)
                 vals      = [feats[c] for c in feature_cols]
-                pred, cat = rf_predict_and_categorize(vals)
-                history   = get_price_history(cid)
-
-                # Formateos y valores extra
-                cp    = feats['current_price']
-                mc    = f"{feats['market_cap']:,}"
-                vol   = f"{feats['total_volume']:,}"
-                chg   = feats['price_change_percentage_24h']
-                color = 'green' if chg >= 0 else 'red'
-                upd   = feats['last_updated'].replace('T',' ').replace('Z','')
-                home  = feats['homepage']
-                chart_script = f'<script id="chart-data" type="application/json">{history}</script>'
-
-                # Consejo según predicción
-                advice = (
-                  "Gran oportunidad: predicción alta, podrías asignar posición moderada." if pred>10 else
-                  "Oportunidad moderada: tendencia positiva, vigila volatilidad." if pred>5 else
-                  "Riesgo bajo: crecimiento leve, mantén expectativas moderadas." if pred>0 else
-                  "No recomendado: predicción negativa, mejor espera."
-                )
-
-                resultado_predict = f"""
+                with profiler.stage('rf_predict_and_categorize'):
+                    pred, cat = rf_predict_and_categorize(vals)
+
+                with profiler.stage('render'):
+                    # Formateos y valores extra (montos convertidos desde USD)
+                    money = convert_records([feats], currency)[0]
+                    cs    = currency_symbol(currency)
+                    cp    = format_price(money['current_price'])
+                    mc    = f"{money['market_cap']:,.0f}"
+                    vol   = f"{money['total_volume']:,.0f}"
+                    chg   = feats['price_change_percentage_24h']
+                    color = 'green' if chg >= 0 else 'red'
+                    upd   = feats['last_updated'].replace('T',' ').replace('Z','')
+                    home  = feats['homepage']
+                    chart_script = f'<div id="chart-data" data-id="{cid}" data-currency="{currency}" hidden></div>'
+
+                    # Consejo según predicción
+                    advice = (
+                      "Gran oportunidad: predicción alta, podrías asignar posición moderada." if pred>10 else
+                      "Oportunidad moderada: tendencia positiva, vigila volatilidad." if pred>5 else
+                      "Riesgo bajo: crecimiento leve, mantén expectativas moderadas." if pred>0 else
+                      "No recomendado: predicción negativa, mejor espera."
+                    )
+
+                    resultado_predict = f"""
 <div class="crypto-card show">
   <h3>
     <img src="{feats['image']}" width="32" height="32" alt="{sym}">
     {sym.capitalize()} ({cid})
   </h3>
   <div class="info">
-    <p><strong>Precio actual:</strong> ${cp}</p>
-    <p><strong>Market Cap:</strong> ${mc}</p>
+    <p><strong>Precio actual:</strong> {cs}{cp}</p>
+    <p><strong>Market Cap:</strong> {cs}{mc}</p>
     <p><strong>Vol 24h:</strong> {vol}</p>
     <p><strong>Predicción:</strong> {pred}%</p>
     <p><strong>Categoría:</strong> {cat}</p>
     <p><strong>Cambio 24h:</strong> <span style="color:{color};">{chg:.2f}%</span></p>
-    <p title="All Time High"><strong>ATH:</strong> ${feats['ath']}</p>
-    <p title="All Time Low"><strong>ATL:</strong> ${feats['atl']}</p>
+    <p title="All Time High"><strong>ATH:</strong> {cs}{format_price(money['ath'])}</p>
+    <p title="All Time Low"><strong>ATL:</strong> {cs}{format_price(money['atl'])}</p>
     <p><small>Última actualización: {upd}</small></p>
     {f'<p><a href="{home}" target="_blank" style="color:#00bcd4;">Sitio oficial</a></p>' if home else ''}
     <p><em>{advice}</em></p>
@@ -653,7 +925,9 @@ def home():
             try:
                 risk_tolerance = request.form.get('risk_tolerance', 'MEDIO')
                 limit = int(request.form.get('limit', 10))
-                recommendations = generate_recommendations(risk_tolerance, limit)
+                currency = parse_currency(request.form.get('currency'))
+                recommendations = convert_records(generate_recommendations(risk_tolerance, limit), currency)
+                cs = currency_symbol(currency)
                 
                 if recommendations:
                     cards = ""
@@ -666,11 +940,11 @@ def home():
     <span class="risk-badge risk-{rec['risk_level']}">{rec['risk_level']}</span>
   </h4>
   <div class="category-badge cat-{rec['category']}">{rec['category']}</div>
-  <p><strong>Precio:</strong> ${rec['current_price']}</p>
+  <p><strong>Precio:</strong> {cs}{format_price(rec['current_price'])}</p>
   <p><strong>Predicción:</strong> {rec['prediction']}%</p>
   <p><strong>Score Final:</strong> {rec['final_score']}</p>
   <p><strong>Cambio 24h:</strong> <span style="color:{'green' if rec['price_change_24h'] >= 0 else 'red'};">{rec['price_change_24h']:.2f}%</span></p>
-  <p><strong>Market Cap:</strong> ${rec['market_cap']:,}</p>
+  <p><strong>Market Cap:</strong> {cs}{rec['market_cap']:,.0f}</p>
   <p><small><em>{rec['recommendation_reason']}</em></small></p>
 </div>
 """
@@ -689,7 +963,9 @@ def home():
             try:
                 budget = float(request.form.get('budget', 1000))
                 risk_tolerance = request.form.get('risk_tolerance', 'MEDIO')
-                portfolio = get_portfolio_suggestions(budget, risk_tolerance)
+                currency = parse_currency(request.form.get('currency'))
+                portfolio = get_portfolio_suggestions(budget, risk_tolerance, currency)
+                cs = currency_symbol(currency)
                 
                 if portfolio:
                     total_investment = sum(p['suggested_investment'] for p in portfolio)
@@ -702,19 +978,19 @@ def home():
     {p['name']} ({p['symbol'].upper()})
   </h4>
   <div class="category-badge cat-{p['category']}">{p['category']}</div>
-  <p><strong>Inversión sugerida:</strong> ${p['suggested_investment']}</p>
+  <p><strong>Inversión sugerida:</strong> {cs}{p['suggested_investment']}</p>
   <p><strong>Cantidad:</strong> {p['suggested_amount']} {p['symbol'].upper()}</p>
   <p><strong>% del portafolio:</strong> {p['allocation_percentage']}%</p>
-  <p><strong>Precio actual:</strong> ${p['current_price']}</p>
+  <p><strong>Precio actual:</strong> {cs}{format_price(p['current_price'])}</p>
   <p><strong>Predicción:</strong> {p['prediction']}%</p>
   <p><strong>Riesgo:</strong> <span class="risk-badge risk-{p['risk_level']}">{p['risk_level']}</span></p>
 </div>
 """
                     resultado_portfolio = f"""
 <div class="portfolio-summary">
-  <h2>Portafolio Sugerido (${budget:,.0f} - Riesgo {risk_tolerance})</h2>
-  <p><strong>Total asignado:</strong> ${total_investment:,.2f}</p>
-  <p><strong>Efectivo restante:</strong> ${budget - total_investment:,.2f}</p>
+  <h2>Portafolio Sugerido ({cs}{budget:,.0f} - Riesgo {risk_tolerance})</h2>
+  <p><strong>Total asignado:</strong> {cs}{total_investment:,.2f}</p>
+  <p><strong>Efectivo restante:</strong> {cs}{budget - total_investment:,.2f}</p>
   <p><strong>Número de activos:</strong> {len(portfolio)}</p>
 </div>
 <div class="recommendations-grid">
@@ -726,7 +1002,8 @@ def home():
             except Exception as e:
                 resultado_portfolio = f"<p class='error'>Error: {e}</p>"
 
-    return html_form % (resultado_predict, resultado_recommendations, resultado_portfolio)
+    with profiler.stage('render_page'):
+        return html_form % (resultado_predict, resultado_recommendations, resultado_portfolio)
 
 @app.route('/api/predict-crypto', methods=['POST'])
 def predict_crypto_api():
@@ -735,10 +1012,13 @@ def predict_crypto_api():
     if not sym:
         return jsonify({'error':'Debes enviar {"symbol":"bitcoin"}'}), 400
     try:
-        cid       = lookup_crypto_id(sym)
-        feats     = get_crypto_features(cid)
+        with profiler.stage('lookup_crypto_id'):
+            cid   = lookup_crypto_id(sym)
+        with profiler.stage('get_crypto_features'):
+            feats = get_crypto_features(cid)
         vals      = [feats[c] for c in feature_cols]
-        pred, cat = rf_predict_and_categorize(vals)
+        with profiler.stage('rf_predict_and_categorize'):
+            pred, cat = rf_predict_and_categorize(vals)
         return jsonify({
             'symbol'    : sym.lower(),
             'crypto_id' : cid,
@@ -749,17 +1029,85 @@ def predict_crypto_api():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chart-data', methods=['GET'])
+def chart_data_api():
+    crypto_id = request.args.get('id', '').strip()
+    if not crypto_id:
+        return jsonify({'error': 'Debes enviar ?id=bitcoin'}), 400
+    try:
+        points = int(request.args.get('points', 300))
+    except ValueError:
+        points = 0
+    if points < 3:
+        return jsonify({'error': 'points debe ser un entero >= 3'}), 400
+    points = min(points, MAX_CHART_POINTS)
+    fmt    = request.args.get('format', 'json')
+    if fmt not in CHART_FORMATS:
+        return jsonify({'error': f"format debe ser uno de: {', '.join(CHART_FORMATS)}"}), 400
+    try:
+        currency = parse_currency(request.args.get('currency'))
+        with profiler.stage('get_price_history'):
+            series = get_price_history(crypto_id)
+        with profiler.stage('downsample'):
+            times, prices = lttb_downsample(*series, points)
+        prices = prices * get_fx_rate(currency)
+        if fmt == 'binary':
+            return Response(encode_chart_binary(times, prices), mimetype='application/octet-stream')
+        return jsonify({
+            'id'    : crypto_id,
+            'currency': currency,
+            'count' : len(times),
+            'times' : times.astype(np.int64).tolist(),
+            'prices': prices.tolist()
+        })
+    except UnsupportedCurrencyError as e:
+        return jsonify({'error': str(e)}), 400
+    except FxUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/similar', methods=['GET'])
+def get_similar_api():
+    sym = request.args.get('symbol', '').strip()
+    if not sym:
+        return jsonify({'error': 'Debes enviar ?symbol=bitcoin'}), 400
+    try:
+        k = int(request.args.get('k', 5))
+    except ValueError:
+        k = 0
+    if k < 1:
+        return jsonify({'error': 'k debe ser un entero >= 1'}), 400
+    k = min(k, MAX_SIMILAR)
+    try:
+        currency = parse_currency(request.args.get('currency'))
+        result = get_similar_cryptos(sym, k)
+        result['similar'] = convert_records(result['similar'], currency)
+        return jsonify({'symbol': sym.lower(), **result, 'count': len(result['similar']), 'currency': currency})
+    except UnsupportedCurrencyError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/recommendations', methods=['GET'])
 def get_recommendations_api():
     risk_tolerance = request.args.get('risk_tolerance', 'MEDIO')
     limit = int(request.args.get('limit', 10))
     try:
-        recommendations = generate_recommendations(risk_tolerance, limit)
+        currency = parse_currency(request.args.get('currency'))
+        recommendations = convert_records(generate_recommendations(risk_tolerance, limit), currency)
         return jsonify({
             'recommendations': recommendations,
             'count': len(recommendations),
-            'risk_tolerance': risk_tolerance
+            'risk_tolerance': risk_tolerance,
+            'currency': currency
         })
+    except UnsupportedCurrencyError as e:
+        return jsonify({'error': str(e)}), 400
+    except FxUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -769,7 +1117,8 @@ def get_portfolio_api():
     budget = payload.get('budget', 1000)
     risk_tolerance = payload.get('risk_tolerance', 'MEDIO')
     try:
-        portfolio = get_portfolio_suggestions(budget, risk_tolerance)
+        currency = parse_currency(payload.get('currency'))
+        portfolio = get_portfolio_suggestions(budget, risk_tolerance, currency)
         total_investment = sum(p['suggested_investment'] for p in portfolio)
         return jsonify({
             'portfolio': portfolio,
@@ -777,10 +1126,45 @@ def get_portfolio_api():
             'total_investment': total_investment,
             'remaining_cash': budget - total_investment,
             'asset_count': len(portfolio),
-            'risk_tolerance': risk_tolerance
+            'risk_tolerance': risk_tolerance,
+            'currency': currency
         })
+    except UnsupportedCurrencyError as e:
+        return jsonify({'error': str(e)}), 400
+    except FxUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 6) Administración del perfilado
+def admin_allowed():
+    if ADMIN_TOKEN:
+        return request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling_admin():
+    if not admin_allowed():
+        return jsonify({'error': 'No autorizado'}), 403
+    if request.method == 'POST':
+        payload = request.json or {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+        try:
+            profiler.configure(
+                enabled=payload.get('enabled'),
+                sample_rate=payload.get('sample_rate'),
+                reset=payload.get('reset', False)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(profiler.status())
+
+@app.route('/admin/profiling/stacks', methods=['GET'])
+def profiling_stacks():
+    if not admin_allowed():
+        return jsonify({'error': 'No autorizado'}), 403
+    return Response(profiler.collapsed_stacks(), mimetype='text/plain')
+
 if __name__=='__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
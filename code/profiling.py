@@ -0,0 +1,163 @@
+"""Perfilado opcional por request: cabecera Server-Timing y pilas muestreadas.
+
+Se activa con PROFILING=1 (y PROFILE_SAMPLE_RATE) o en caliente desde
+/admin/profiling. Desactivado, stage() devuelve un contexto vacío compartido
+y los hooks de Flask retornan de inmediato.
+
+Las pilas se acumulan en formato "collapsed" (frame;frame;frame cuenta), que
+consumen directamente flamegraph.pl, speedscope o inferno. El primer frame de
+cada pila es la etapa activa (p. ej. rf_predict_and_categorize o render).
+"""
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from flask import g, has_request_context
+
+_NOOP = nullcontext()
+
+class RequestProfiler:
+    def __init__(self, enabled=False, sample_rate=0.1, interval=0.005):
+        self.enabled          = enabled
+        self.sample_rate      = sample_rate
+        self.interval         = interval
+        self.root_path        = None
+        self.stacks           = Counter()
+        self.sampled_requests = 0
+        self._stages          = {}  # thread id -> etapa activa
+        self._lock            = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        profiler = cls(enabled=os.environ.get('PROFILING', '0') == '1')
+        profiler.configure(sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1)))
+        return profiler
+
+    def init_app(self, app):
+        self.root_path = app.root_path
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def configure(self, enabled=None, sample_rate=None, reset=False):
+        """Cambia la configuración en caliente; solo acepta booleanos y números reales (ValueError si no)"""
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError("enabled debe ser true o false")
+        if sample_rate is not None and (isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float))
+                                        or math.isnan(sample_rate)):
+            raise ValueError("sample_rate debe ser un número entre 0 y 1")
+        if not isinstance(reset, bool):
+            raise ValueError("reset debe ser true o false")
+
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if reset:
+            with self._lock:
+                self.stacks.clear()
+                self.sampled_requests = 0
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'interval_ms': self.interval * 1000,
+            'sampled_requests': self.sampled_requests,
+            'distinct_stacks': len(self.stacks),
+        }
+
+    def collapsed_stacks(self) -> str:
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    # Medición de etapas
+    def stage(self, name: str):
+        """Contexto que mide una etapa del request; sin costo si el perfilado está apagado"""
+        if not self.enabled or not has_request_context() or 'stage_timings' not in g:
+            return _NOOP
+        return self._timed_stage(name)
+
+    @contextmanager
+    def _timed_stage(self, name):
+        tid = threading.get_ident()
+        previous = self._stages.get(tid)
+        self._stages[tid] = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            g.stage_timings.append((name, (time.perf_counter() - start) * 1000))
+            if previous is None:
+                self._stages.pop(tid, None)
+            else:
+                self._stages[tid] = previous
+
+    # Hooks de Flask
+    def _before_request(self):
+        if not self.enabled:
+            return
+        g.stage_timings = []
+        g.request_start = time.perf_counter()
+        if random.random() < self.sample_rate:
+            g.stack_sampler = _StackSampler(self, threading.get_ident())
+            g.stack_sampler.start()
+
+    def _after_request(self, response):
+        if 'stage_timings' not in g:
+            return response
+        total = (time.perf_counter() - g.request_start) * 1000
+        metrics = [f"{name};dur={dur:.1f}" for name, dur in g.stage_timings]
+        metrics.append(f"total;dur={total:.1f}")
+        response.headers['Server-Timing'] = ", ".join(metrics)
+        return response
+
+    def _teardown_request(self, exc):
+        # Corre siempre, también si la vista o after_request lanzaron una excepción
+        sampler = g.pop('stack_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+        self._stages.pop(threading.get_ident(), None)
+
+    def _merge(self, stacks):
+        with self._lock:
+            self.stacks.update(stacks)
+            self.sampled_requests += 1
+
+class _StackSampler(threading.Thread):
+    """Muestrea la pila del hilo del request cada `interval` segundos hasta stop()"""
+
+    def __init__(self, profiler, thread_id):
+        super().__init__(daemon=True)
+        self.profiler  = profiler
+        self.thread_id = thread_id
+        self._done     = threading.Event()
+
+    def run(self):
+        stacks = Counter()
+        while not self._done.wait(self.profiler.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            frames = []
+            while frame is not None:
+                frames.append(frame.f_code)
+                frame = frame.f_back
+            frames.reverse()
+
+            # Se descartan los frames de werkzeug/flask anteriores al código de la app
+            root = self.profiler.root_path
+            first = next((i for i, c in enumerate(frames) if root and c.co_filename.startswith(root)), 0)
+            names = [f"{os.path.basename(c.co_filename)}:{c.co_name}" for c in frames[first:]]
+            stage = self.profiler._stages.get(self.thread_id, 'other')
+            stacks[";".join([stage] + names)] += 1
+        self.profiler._merge(stacks)
+
+    def stop(self):
+        self._done.set()
+        self.join()
@@ -0,0 +1,141 @@
+"""Embeddings del autoencoder e índice de vecinos más cercanos para "monedas similares".
+
+El encoder se exporta desde train.py como pesos NumPy (encoder.npz) junto con
+los centroides de KMeans (kmeans.npz), así el servicio no necesita PyTorch.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+# 1) Encoder y clusters en NumPy
+class NumpyEncoder:
+    """Capas densas con ReLU opcional; reproduce autoencoder.encoder del notebook"""
+
+    def __init__(self, weights, biases, relu):
+        self.weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.biases  = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.relu    = [bool(r) for r in relu]
+
+    @property
+    def dim(self) -> int:
+        return self.weights[-1].shape[1]
+
+    def encode(self, X_scaled):
+        h = np.atleast_2d(np.asarray(X_scaled, dtype=np.float32))
+        for w, b, relu in zip(self.weights, self.biases, self.relu):
+            h = h @ w + b
+            if relu:
+                np.maximum(h, 0, out=h)
+        return h
+
+    def save(self, path: str):
+        arrays = {f'W{i}': w for i, w in enumerate(self.weights)}
+        arrays.update({f'b{i}': b for i, b in enumerate(self.biases)})
+        np.savez(path, relu=np.array(self.relu), **arrays)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            n = len(data['relu'])
+            return cls([data[f'W{i}'] for i in range(n)], [data[f'b{i}'] for i in range(n)], data['relu'])
+
+def assign_clusters(embeddings, centers):
+    """Etiqueta KMeans: índice del centroide más cercano"""
+    d = ((embeddings[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    return d.argmin(axis=1)
+
+# 2) Índice de vecinos más cercanos
+class IndexState(NamedTuple):
+    """Versión inmutable del índice; update() reemplaza la referencia completa"""
+    ids:        tuple
+    position:   dict
+    records:    dict
+    features:   np.ndarray
+    embeddings: np.ndarray
+    sq_norms:   np.ndarray
+    clusters:   np.ndarray
+
+class SimilarityIndex:
+    """Búsqueda exacta por fuerza bruta vectorizada sobre los embeddings del universo.
+
+    update() solo recalcula los embeddings de las monedas cuyas características
+    cambiaron desde la última actualización, agrega las nuevas y descarta las que
+    salieron del snapshot. El resultado se publica con una sola asignación de
+    `state`, así quien lea `index.state` una vez ve ids, embeddings y registros
+    de la misma versión aunque otro hilo actualice el índice en paralelo.
+    """
+
+    def __init__(self, encoder: NumpyEncoder, centers=None):
+        self.encoder = encoder
+        self.centers = None if centers is None else np.asarray(centers, dtype=np.float32)
+        self.state   = IndexState(
+            ids        = (),
+            position   = {},
+            records    = {},
+            features   = np.empty((0, 0), dtype=np.float32),
+            embeddings = np.empty((0, encoder.dim), dtype=np.float32),
+            sq_norms   = np.empty(0, dtype=np.float32),
+            clusters   = np.empty(0, dtype=np.int32),
+        )
+
+    def __len__(self):
+        return len(self.state.ids)
+
+    def update(self, ids, features_scaled, records=None):
+        """Sincroniza el índice con el snapshot (ids, características escaladas y,
+        opcionalmente, el registro de cada moneda). Devuelve cuántas se re-embebieron"""
+        old = self.state
+        ids = tuple(ids)
+        features_scaled = np.array(features_scaled, dtype=np.float32)
+        embeddings = np.empty((len(ids), self.encoder.dim), dtype=np.float32)
+
+        stale = []
+        for row, crypto_id in enumerate(ids):
+            prev = old.position.get(crypto_id)
+            if prev is not None and np.array_equal(old.features[prev], features_scaled[row]):
+                embeddings[row] = old.embeddings[prev]
+            else:
+                stale.append(row)
+        if stale:
+            embeddings[stale] = self.encoder.encode(features_scaled[stale])
+
+        clusters = (assign_clusters(embeddings, self.centers) if self.centers is not None
+                    else np.zeros(len(ids), dtype=np.int32))
+        for array in (features_scaled, embeddings, clusters):
+            array.flags.writeable = False
+        sq_norms = (embeddings ** 2).sum(axis=1)
+        sq_norms.flags.writeable = False
+
+        self.state = IndexState(
+            ids        = ids,
+            position   = {crypto_id: row for row, crypto_id in enumerate(ids)},
+            records    = dict(zip(ids, records)) if records is not None else {},
+            features   = features_scaled,
+            embeddings = embeddings,
+            sq_norms   = sq_norms,
+            clusters   = clusters,
+        )
+        return len(stale)
+
+    def query(self, embedding, k=5, exclude=None, state=None):
+        """Devuelve [(crypto_id, distancia, cluster)] de los k vecinos más cercanos.
+
+        `state` permite consultar la misma versión de la que se sacó el embedding;
+        por defecto se usa la vigente.
+        """
+        state = self.state if state is None else state
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        d2 = state.sq_norms - 2 * state.embeddings @ embedding + embedding @ embedding
+        if exclude in state.position:
+            d2[state.position[exclude]] = np.inf
+        k = min(k, len(state.ids) - (exclude in state.position))
+        if k <= 0:
+            return []
+        top = np.argpartition(d2, k - 1)[:k]
+        top = top[np.argsort(d2[top])]
+        return [(state.ids[i], float(np.sqrt(max(d2[i], 0.0))), int(state.clusters[i])) for i in top]
+
+    def cluster_of(self, embedding) -> int:
+        if self.centers is None:
+            return 0
+        return int(assign_clusters(np.atleast_2d(embedding), self.centers)[0])
@@ -0,0 +1,406 @@
+"""Pipeline de entrenamiento reproducible (reemplaza las celdas del notebook).
+
+Uso:
+    python train.py --data ../data/criptos_5000_narrativas.csv --out models
+
+Carga el CSV una sola vez, guarda la matriz de características en un cache
+indexado por el hash de los datos y la abre como memmap para que todos los
+procesos de validación cruzada la compartan sin copiarla. Los folds y los
+candidatos de hiperparámetros se evalúan en paralelo y al final se exportan
+los artefactos que consume main.py más un reporte de métricas y tiempos.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+from itertools import product
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from scipy.stats import mstats
+from sklearn.cluster import KMeans
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import ElasticNet
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.neural_network import MLPRegressor
+from sklearn.preprocessing import StandardScaler
+
+from similarity import NumpyEncoder
+
+# Mismo orden que feature_cols en main.py (el modelo servido depende de él)
+FEATURE_COLS = [
+    'current_price',
+    'total_volume',
+    'ath',
+    'atl',
+    'price_change_percentage_24h',
+    'ath_change_percentage',
+    'atl_change_percentage'
+]
+NARRATIVAS_VALIDAS = ['IA', 'Videojuegos', 'RWA', 'Memes']
+UMBRAL_VOLUMEN = 1e7
+UMBRAL_OPORTUNIDAD = 5.0
+SEED = 42
+N_CLUSTERS = 3
+
+# Se incrementa cuando cambia la ingeniería de características para invalidar el cache
+FEATURES_VERSION = 1
+
+# Grilla de candidatos por familia de modelo
+PARAM_GRID = {
+    'rf': {
+        'n_estimators': [100, 200],
+        'max_depth': [10, 15],
+        'min_samples_split': [3],
+        'min_samples_leaf': [2],
+        'max_features': [1.0, 'sqrt'],
+    },
+    'gb': {
+        'n_estimators': [200],
+        'max_depth': [3, 5],
+        'learning_rate': [0.05, 0.1],
+    },
+    'enet': {
+        'alpha': [0.001, 0.01, 0.1],
+        'l1_ratio': [0.2, 0.8],
+    },
+    'mlp': {
+        'epochs': [200],
+        'lr': [0.001],
+    },
+}
+
+# 1) Datos y cache de características
+def file_hash(path: str) -> str:
+    """SHA-256 del archivo de datos, leído por bloques"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def build_features(df: pd.DataFrame):
+    """Filtra narrativas y baja capitalización y construye X, y como en el notebook"""
+    df = df[df['narrativa'].isin(NARRATIVAS_VALIDAS) & (df['total_volume'] < UMBRAL_VOLUMEN)]
+
+    ratio_precio_ath = df['current_price'] / df['ath']
+    momentum_score = (
+        df['price_change_percentage_24h'] * 0.5 +
+        df['ath_change_percentage'] * 0.3 +
+        df['atl_change_percentage'] * 0.2
+    )
+
+    # Variable objetivo sintética (misma semilla y fórmula que el notebook)
+    rng = np.random.RandomState(SEED)
+    target = (
+        df['price_change_percentage_24h'] * 0.4 +
+        momentum_score * 0.3 +
+        rng.normal(0, 3, len(df)) +
+        ratio_precio_ath * 10
+    )
+    keep = target.notna().to_numpy()
+    y = np.asarray(mstats.winsorize(target.to_numpy()[keep], limits=[0.05, 0.05]), dtype=np.float64)
+
+    X = df[FEATURE_COLS].replace([np.inf, -np.inf], np.nan).fillna(0).to_numpy(dtype=np.float64)[keep]
+    return np.ascontiguousarray(X), y
+
+def load_features(data_path: str, cache_dir: str):
+    """Devuelve (X, y, X_scaled, y_scaled, scaler_X, scaler_y, data_hash).
+
+    Los arrays se guardan en cache_dir con el hash de los datos como clave y se
+    devuelven como memmaps de solo lectura, de modo que los workers de joblib
+    los comparten en lugar de serializarlos.
+    """
+    data_hash = file_hash(data_path)
+    key = f"{data_hash[:16]}_v{FEATURES_VERSION}"
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = {name: os.path.join(cache_dir, f"{key}_{name}.npy") for name in ('X', 'y', 'Xs', 'ys')}
+    scalers_path = os.path.join(cache_dir, f"{key}_scalers.pkl")
+
+    if not all(os.path.exists(p) for p in list(paths.values()) + [scalers_path]):
+        df = pd.read_csv(data_path, usecols=FEATURE_COLS + ['narrativa'])
+        X, y = build_features(df)
+        scaler_X = StandardScaler().fit(X)
+        scaler_y = StandardScaler().fit(y.reshape(-1, 1))
+        np.save(paths['X'], X)
+        np.save(paths['y'], y)
+        np.save(paths['Xs'], scaler_X.transform(X))
+        np.save(paths['ys'], scaler_y.transform(y.reshape(-1, 1)).ravel())
+        joblib.dump((scaler_X, scaler_y), scalers_path)
+
+    scaler_X, scaler_y = joblib.load(scalers_path)
+    arrays = {name: np.load(p, mmap_mode='r') for name, p in paths.items()}
+    return arrays['X'], arrays['y'], arrays['Xs'], arrays['ys'], scaler_X, scaler_y, data_hash
+
+def split_indices(n: int):
+    """Índices train/holdout (80/20) reproducibles, compartidos con las demás herramientas"""
+    return train_test_split(np.arange(n), test_size=0.2, random_state=SEED)
+
+# 2) Modelos
+class TorchMLP:
+    """Envoltorio fit/predict para el MLP del notebook (requiere PyTorch)"""
+
+    def __init__(self, epochs=200, lr=0.001):
+        self.epochs = epochs
+        self.lr = lr
+
+    def fit(self, X, y):
+        import torch
+        import torch.nn as nn
+
+        torch.manual_seed(SEED)
+        self.net = nn.Sequential(
+            nn.Linear(X.shape[1], 64), nn.ReLU(), nn.Dropout(0.3),
+            nn.Linear(64, 32), nn.ReLU(), nn.Dropout(0.2),
+            nn.Linear(32, 16), nn.ReLU(),
+            nn.Linear(16, 1)
+        )
+        inputs = torch.tensor(np.asarray(X), dtype=torch.float32)
+        targets = torch.tensor(np.asarray(y), dtype=torch.float32).view(-1, 1)
+        optimizer = torch.optim.Adam(self.net.parameters(), lr=self.lr)
+        criterion = nn.MSELoss()
+        self.net.train()
+        for _ in range(self.epochs):
+            optimizer.zero_grad()
+            loss = criterion(self.net(inputs), targets)
+            loss.backward()
+            optimizer.step()
+        return self
+
+    def predict(self, X):
+        import torch
+
+        self.net.eval()
+        with torch.no_grad():
+            return self.net(torch.tensor(np.asarray(X), dtype=torch.float32)).numpy().ravel()
+
+def torch_available() -> bool:
+    try:
+        import torch  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def make_model(family: str, params: dict, n_jobs: int = 1):
+    if family == 'rf':
+        return RandomForestRegressor(random_state=SEED, n_jobs=n_jobs, **params)
+    if family == 'gb':
+        return GradientBoostingRegressor(random_state=SEED, **params)
+    if family == 'enet':
+        return ElasticNet(random_state=SEED, max_iter=5000, **params)
+    if family == 'mlp':
+        return TorchMLP(**params)
+    raise ValueError(f"Familia de modelo desconocida: '{family}'")
+
+def expand_grid(grid: dict):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in product(*(grid[k] for k in keys))]
+
+def train_encoder(X_scaled):
+    """Entrena el autoencoder del notebook (entrada→32→16→8) y devuelve su encoder en NumPy.
+
+    Sin PyTorch se usa un MLPRegressor X→X con la misma arquitectura; en ese
+    caso la capa de 8 dimensiones también lleva ReLU.
+    """
+    X_scaled = np.asarray(X_scaled, dtype=np.float32)
+    if not torch_available():
+        ae = MLPRegressor(hidden_layer_sizes=(32, 16, 8, 16, 32), activation='relu',
+                          learning_rate_init=0.001, max_iter=300, random_state=SEED)
+        ae.fit(X_scaled, X_scaled)
+        return NumpyEncoder(ae.coefs_[:3], ae.intercepts_[:3], relu=[True, True, True])
+
+    import torch
+    import torch.nn as nn
+
+    torch.manual_seed(SEED)
+    encoder = nn.Sequential(nn.Linear(X_scaled.shape[1], 32), nn.ReLU(), nn.Linear(32, 16), nn.ReLU(), nn.Linear(16, 8))
+    decoder = nn.Sequential(nn.Linear(8, 16), nn.ReLU(), nn.Linear(16, 32), nn.ReLU(), nn.Linear(32, X_scaled.shape[1]))
+    params = list(encoder.parameters()) + list(decoder.parameters())
+    optimizer = torch.optim.Adam(params, lr=0.001)
+    loss_fn = nn.MSELoss()
+    inputs = torch.tensor(X_scaled)
+    for _ in range(100):
+        optimizer.zero_grad()
+        loss = loss_fn(decoder(encoder(inputs)), inputs)
+        loss.backward()
+        optimizer.step()
+
+    linears = [m for m in encoder if isinstance(m, nn.Linear)]
+    return NumpyEncoder(
+        [m.weight.detach().numpy().T for m in linears],
+        [m.bias.detach().numpy() for m in linears],
+        relu=[True, True, False],
+    )
+
+# 3) Validación cruzada en paralelo
+def fit_fold(family, params, X_scaled, y_scaled, scaler_y, train_idx, val_idx):
+    """Entrena un candidato en un fold y devuelve su MAE en la escala original"""
+    start = time.perf_counter()
+    model = make_model(family, params)
+    model.fit(X_scaled[train_idx], y_scaled[train_idx])
+    pred_scaled = model.predict(X_scaled[val_idx]).reshape(-1, 1)
+    pred = scaler_y.inverse_transform(pred_scaled).ravel()
+    y_true = scaler_y.inverse_transform(np.asarray(y_scaled[val_idx]).reshape(-1, 1)).ravel()
+    return mean_absolute_error(y_true, pred), time.perf_counter() - start
+
+def cross_validate(families, X_scaled, y_scaled, scaler_y, train_idx, folds, n_jobs):
+    """Evalúa todos los (candidato, fold) como tareas independientes"""
+    kfold = KFold(n_splits=folds, shuffle=True, random_state=SEED)
+    splits = [(train_idx[tr], train_idx[va]) for tr, va in kfold.split(train_idx)]
+    candidates = [(family, params) for family in families for params in expand_grid(PARAM_GRID[family])]
+
+    tasks = [(c, s) for c in range(len(candidates)) for s in range(len(splits))]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(fit_fold)(candidates[c][0], candidates[c][1], X_scaled, y_scaled, scaler_y, *splits[s])
+        for c, s in tasks
+    )
+
+    per_candidate = {}
+    for (c, _), (mae, seconds) in zip(tasks, results):
+        entry = per_candidate.setdefault(c, {'maes': [], 'seconds': 0.0})
+        entry['maes'].append(mae)
+        entry['seconds'] += seconds
+
+    report = []
+    for c, (family, params) in enumerate(candidates):
+        maes = np.array(per_candidate[c]['maes'])
+        report.append({
+            'family': family,
+            'params': params,
+            'cv_mae': round(float(maes.mean()), 4),
+            'cv_std': round(float(maes.std()), 4),
+            'fit_seconds': round(per_candidate[c]['seconds'], 3),
+        })
+    report.sort(key=lambda r: r['cv_mae'])
+    return report
+
+# 4) Evaluación y exportación
+def holdout_metrics(y_true, y_pred):
+    oport_real = y_true > UMBRAL_OPORTUNIDAD
+    oport_pred = y_pred > UMBRAL_OPORTUNIDAD
+    tp = int(np.sum(oport_real & oport_pred))
+    fp = int(np.sum(~oport_real & oport_pred))
+    fn = int(np.sum(oport_real & ~oport_pred))
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+    return {
+        'mae': round(float(mean_absolute_error(y_true, y_pred)), 4),
+        'mse': round(float(mean_squared_error(y_true, y_pred)), 4),
+        'r2': round(float(r2_score(y_true, y_pred)), 4),
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1_score': round(2 * precision * recall / (precision + recall), 4) if (precision + recall) > 0 else 0.0,
+    }
+
+def run(args):
+    timings = {}
+    t0 = time.perf_counter()
+
+    start = time.perf_counter()
+    X, y, X_scaled, y_scaled, scaler_X, scaler_y, data_hash = load_features(args.data, args.cache_dir)
+    timings['load_features'] = time.perf_counter() - start
+
+    train_idx, test_idx = split_indices(len(y))
+    families = [f for f in args.models if f != 'mlp' or torch_available()]
+    if len(families) < len(args.models):
+        print("PyTorch no está disponible: se omite el MLP.")
+
+    start = time.perf_counter()
+    cv_report = cross_validate(families, X_scaled, y_scaled, scaler_y, train_idx, args.folds, args.jobs)
+    timings['cross_validation'] = time.perf_counter() - start
+
+    # El servicio sirve un Random Forest: se reentrena el mejor candidato RF
+    best_rf = next((r for r in cv_report if r['family'] == 'rf'), None)
+    if best_rf is None:
+        raise ValueError("La grilla debe incluir al menos un candidato 'rf'")
+
+    start = time.perf_counter()
+    model_rf = make_model('rf', best_rf['params'], n_jobs=args.jobs)
+    model_rf.fit(X_scaled[train_idx], y_scaled[train_idx])
+    model_rf.set_params(n_jobs=None)  # el servicio predice fila por fila
+    timings['final_fit'] = time.perf_counter() - start
+
+    pred = scaler_y.inverse_transform(model_rf.predict(X_scaled[test_idx]).reshape(-1, 1)).ravel()
+    metrics = holdout_metrics(np.asarray(y[test_idx]), pred)
+
+    # Embeddings para el índice de monedas similares
+    start = time.perf_counter()
+    encoder = train_encoder(X_scaled[train_idx])
+    kmeans = KMeans(n_clusters=N_CLUSTERS, random_state=SEED, n_init=10)
+    kmeans.fit(encoder.encode(X_scaled[train_idx]))
+    timings['embeddings'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Cada corrida en su propio directorio: no se pisan modelos ni variantes derivadas
+    created_at = datetime.now(timezone.utc)
+    run_id = f"{created_at:%Y%m%dT%H%M%S}-{data_hash[:12]}"
+    out_dir = os.path.join(args.out, run_id)
+    os.makedirs(out_dir)
+    joblib.dump(model_rf, os.path.join(out_dir, 'rf_model.pkl'))
+    joblib.dump(scaler_X, os.path.join(out_dir, 'scaler_X.pkl'))
+    joblib.dump(scaler_y, os.path.join(out_dir, 'scaler_y.pkl'))
+    encoder.save(os.path.join(out_dir, 'encoder.npz'))
+    np.savez(os.path.join(out_dir, 'kmeans.npz'), centers=kmeans.cluster_centers_.astype(np.float32))
+    timings['export'] = time.perf_counter() - start
+    timings['total'] = time.perf_counter() - t0
+
+    manifest = {
+        'run_id': run_id,
+        'created_at': created_at.isoformat(),
+        'data_path': os.path.abspath(args.data),
+        'data_sha256': data_hash,
+        'features_version': FEATURES_VERSION,
+        'feature_cols': FEATURE_COLS,
+        'n_rows': int(len(y)),
+        'n_train': int(len(train_idx)),
+        'n_holdout': int(len(test_idx)),
+        'model': {'family': 'rf', 'params': best_rf['params'], 'cv_mae': best_rf['cv_mae']},
+        'holdout_metrics': metrics,
+        'artifacts': ['rf_model.pkl', 'scaler_X.pkl', 'scaler_y.pkl', 'encoder.npz', 'kmeans.npz'],
+        'versions': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+        },
+    }
+    report = {
+        'timings_seconds': {k: round(v, 3) for k, v in timings.items()},
+        'n_jobs': args.jobs,
+        'folds': args.folds,
+        'cv': cv_report,
+        'holdout_metrics': metrics,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Filas: {len(y)}  |  candidatos: {len(cv_report)}  |  folds: {args.folds}")
+    for r in cv_report[:5]:
+        print(f"• {r['family']:<4} MAE CV {r['cv_mae']:.3f} ± {r['cv_std']:.3f}  {r['params']}")
+    print(f"Holdout RF: MAE {metrics['mae']:.3f}  R² {metrics['r2']:.4f}  F1 {metrics['f1_score']:.3f}")
+    print("Tiempos: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    print(f"Artefactos en {out_dir}")
+    return out_dir
+
+def parse_args(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Entrena y exporta el modelo de predicción de criptos")
+    parser.add_argument('--data', default=os.path.join(here, '..', 'data', 'criptos_5000_narrativas.csv'))
+    parser.add_argument('--out', default=os.path.join(here, 'models'),
+                        help="Directorio del registro; cada corrida va en <out>/<fecha>-<hash de datos>")
+    parser.add_argument('--cache-dir', default=os.path.join(here, '.feature_cache'))
+    parser.add_argument('--models', nargs='+', default=['rf', 'gb', 'enet', 'mlp'], choices=list(PARAM_GRID))
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help="Procesos en paralelo (-1 = todos los núcleos)")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    run(parse_args())